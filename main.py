@@ -64,12 +64,10 @@ def main():
                   packet_drop_rate=args.packet_loss)
     
     # Add vehicles to world and plan paths
-    from planning.pathfinder import PathFinder
-    pathfinder = PathFinder(map_obj)
-    
+    # (share the world's pathfinder so its path cache is reused across vehicles)
     for vehicle in vehicles:
         if vehicle.destination:
-            path = pathfinder.find_path((vehicle.x, vehicle.y), vehicle.destination)
+            path = world.pathfinder.find_path((vehicle.x, vehicle.y), vehicle.destination)
             if path:
                 vehicle.set_path(path)
         world.add_vehicle(vehicle)
@@ -81,7 +79,6 @@ def main():
     # Main simulation loop
     running = True
     paused = False
-    pause_key_pressed = False
     
     print("SafeWay Simulation Started")
     print(f"Mode: {args.mode}")
@@ -92,19 +89,16 @@ def main():
     
     while running:
         # Handle events
-        running = renderer.handle_events()
+        running, events = renderer.handle_events()
         
-        # Handle keyboard input for pause
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_SPACE] and not pause_key_pressed:
-            paused = not paused
-            pause_key_pressed = True
-            if paused:
-                print("Simulation paused")
-            else:
-                print("Simulation resumed")
-        elif not keys[pygame.K_SPACE]:
-            pause_key_pressed = False
+        # Toggle pause on key press (event-driven, so holding SPACE doesn't repeat)
+        for event in events:
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                paused = not paused
+                if paused:
+                    print("Simulation paused")
+                else:
+                    print("Simulation resumed")
         
         if not paused:
             # Update simulation
@@ -114,11 +108,11 @@ def main():
         renderer.clear()
         renderer.draw_map(map_obj)
         
-        # Draw vehicles and V2V connections
+        # Draw V2V connections for all vehicles at once, then vehicles on top
+        if use_v2v:
+            _, positions, _, _ = world.snapshot()
+            renderer.draw_v2v_links(positions, world.neighbor_pairs())
         for vehicle in world.vehicles.values():
-            nearby = world.get_nearby_vehicles_for_rendering(vehicle.id)
-            if use_v2v:
-                renderer.draw_v2v_connections(vehicle, nearby, args.radius)
             renderer.draw_vehicle(vehicle, show_trajectory=True, show_intent=True)
         
         # Draw UI
@@ -1,14 +1,46 @@
+import math
 import numpy as np
+from numba import njit
 from typing import List, Dict, Tuple, Optional
 from vehicles.vehicle import Vehicle, Intent
 from v2v.message import V2VMessage
 
 
+@njit(cache=True, fastmath=True)
+def _ttc(traj1, traj2, buf2, dt):
+    """Time of the first step two trajectories are within sqrt(buf2), or -1.0"""
+    for i in range(min(traj1.shape[0], traj2.shape[0])):
+        dx = traj1[i, 0] - traj2[i, 0]
+        dy = traj1[i, 1] - traj2[i, 1]
+        if dx * dx + dy * dy < buf2:
+            return i * dt
+    return -1.0
+
+
+# No fastmath here: NaN-padded steps must keep comparing False
+@njit(cache=True)
+def _batch_ttc(ego_traj, others, buf2, dt, out):
+    """Fill out[k] with the time to collision between ego_traj and others[k] (inf if none)"""
+    horizon = min(ego_traj.shape[0], others.shape[1])
+    for k in range(others.shape[0]):
+        out[k] = np.inf
+        for i in range(horizon):
+            dx = others[k, i, 0] - ego_traj[i, 0]
+            dy = others[k, i, 1] - ego_traj[i, 1]
+            if dx * dx + dy * dy < buf2:
+                out[k] = i * dt
+                break
+
+
 class ConflictResolver:
     """Handles conflict detection and resolution between vehicles"""
     
     def __init__(self, safety_buffer: float = 2.0, prediction_horizon: int = 10):
         self.safety_buffer = safety_buffer  # minimum distance between vehicles
+        # Squared thresholds so distance checks never need a sqrt
+        self._buf2 = safety_buffer**2
+        self._buf2_prox = (safety_buffer * 1.5)**2
+        self._buf2_clear = (safety_buffer * 3)**2
         self.prediction_horizon = prediction_horizon
     
     def predict_collision(self, vehicle1: Vehicle, vehicle2: Vehicle, 
@@ -21,61 +53,111 @@ class ConflictResolver:
         traj1 = vehicle1.compute_trajectory(dt, self.prediction_horizon)
         traj2 = vehicle2.compute_trajectory(dt, self.prediction_horizon)
         
-        min_steps = min(len(traj1), len(traj2))
-        
-        for i in range(min_steps):
-            dist = np.sqrt((traj1[i][0] - traj2[i][0])**2 + 
-                          (traj1[i][1] - traj2[i][1])**2)
-            if dist < self.safety_buffer:
-                return i * dt  # time to collision
-        
-        return None
+        return self._first_collision_time(traj1, traj2, dt)
     
     def predict_collision_with_message(self, vehicle: Vehicle, 
                                        message: V2VMessage, dt: float) -> Optional[float]:
         """
         Predict collision using received V2V message
+        The vehicle caches its trajectory, so repeated calls in a tick reuse it
         """
-        # Create temporary vehicle from message
-        temp_vehicle = Vehicle(message.sender_id, message.position[0], message.position[1])
-        temp_vehicle.set_velocity(message.velocity[0], message.velocity[1])
-        temp_vehicle.heading = message.heading
-        temp_vehicle.speed = message.speed
+        ego_traj = vehicle.compute_trajectory(dt, self.prediction_horizon)
         
         # Use planned trajectory from message if available
-        if message.planned_trajectory:
-            traj1 = vehicle.compute_trajectory(dt, self.prediction_horizon)
-            traj2 = message.planned_trajectory[:self.prediction_horizon]
-            
-            min_steps = min(len(traj1), len(traj2))
-            for i in range(min_steps):
-                dist = np.sqrt((traj1[i][0] - traj2[i][0])**2 + 
-                              (traj1[i][1] - traj2[i][1])**2)
-                if dist < self.safety_buffer:
-                    return i * dt
+        if len(message.planned_trajectory):
+            other_traj = message.planned_trajectory[:self.prediction_horizon]
         else:
-            # Fallback to basic prediction
-            return self.predict_collision(vehicle, temp_vehicle, dt)
+            # Fallback to basic prediction from a temporary vehicle
+            temp_vehicle = Vehicle(message.sender_id, message.position[0], message.position[1])
+            temp_vehicle.set_velocity(message.velocity[0], message.velocity[1])
+            temp_vehicle.heading = message.heading
+            temp_vehicle.speed = message.speed
+            other_traj = temp_vehicle.compute_trajectory(dt, self.prediction_horizon)
+        
+        return self._first_collision_time(ego_traj, other_traj, dt)
+    
+    def _first_collision_time(self, traj1: np.ndarray, traj2: np.ndarray,
+                              dt: float) -> Optional[float]:
+        """
+        Time of the first step at which two (H, 2) trajectories come within
+        the safety buffer, or None if they never do
+        """
+        ttc = _ttc(traj1, traj2, self._buf2, dt)
+        if ttc >= 0.0:
+            return ttc  # time to collision
         
         return None
     
+    def batch_predict_collisions(self, ego_traj: np.ndarray,
+                                 others_traj_stack: np.ndarray,
+                                 dt: float) -> np.ndarray:
+        """
+        Predict collisions between one trajectory and a stack of others
+        ego_traj is (H, 2) and others_traj_stack is (M, H, 2); NaN steps never collide
+        Returns length-M array of time to collision (inf where none predicted)
+        """
+        ttc = np.empty(len(others_traj_stack))
+        _batch_ttc(ego_traj, others_traj_stack, self._buf2, dt, ttc)
+        return ttc
+    
+    def _stack_message_trajectories(self, messages: List[V2VMessage],
+                                    dt: float) -> np.ndarray:
+        """
+        Stack the predicted trajectories of all messages into an (M, H, 2) float32 array
+        Steps beyond a shorter planned trajectory are left as NaN
+        """
+        horizon = self.prediction_horizon
+        stack = np.full((len(messages), horizon, 2), np.nan, dtype=np.float32)
+        t = np.arange(1, horizon + 1, dtype=np.float32) * np.float32(dt)
+        
+        for k, message in enumerate(messages):
+            traj = message.planned_trajectory[:horizon]
+            if len(traj):
+                stack[k, :len(traj)] = traj
+            else:
+                # Fallback to constant velocity prediction from the message state
+                stack[k, :, 0] = message.position[0] + message.speed * math.cos(message.heading) * t
+                stack[k, :, 1] = message.position[1] + message.speed * math.sin(message.heading) * t
+        
+        return stack
+    
+    def _candidate_indices(self, vehicle: Vehicle, other_messages: List[V2VMessage],
+                           d2: np.ndarray, dt: float) -> np.ndarray:
+        """
+        Indices of messages whose sender could come within the safety buffer
+        of the vehicle inside the prediction horizon
+        """
+        # Under constant velocity each side moves at most speed * horizon * dt
+        speeds = np.array([message.speed for message in other_messages], dtype=np.float64)
+        reach = self.safety_buffer + (vehicle.speed + speeds) * (self.prediction_horizon * dt)
+        return np.flatnonzero(d2 <= reach * reach)
+    
     def should_yield(self, vehicle: Vehicle, other_messages: List[V2VMessage],
-                    dt: float) -> Tuple[bool, Optional[int]]:
+                    dt: float, d2: Optional[np.ndarray] = None) -> Tuple[bool, Optional[int]]:
         """
         Determine if vehicle should yield to others
+        d2 optionally holds the squared distances to the message positions
         Returns (should_yield, vehicle_id_to_yield_to)
         """
-        closest_conflict = None
-        min_ttc = float('inf')
+        if not other_messages:
+            return (False, None)
         
-        for message in other_messages:
-            ttc = self.predict_collision_with_message(vehicle, message, dt)
-            if ttc is not None and ttc < 2.0:  # collision within 2 seconds
-                if ttc < min_ttc:
-                    min_ttc = ttc
-                    closest_conflict = message
+        # Prefilter so only reachable senders pay for trajectory prediction
+        if d2 is None:
+            d2 = self.message_distances_sq(vehicle, other_messages)
+        candidates = self._candidate_indices(vehicle, other_messages, d2, dt)
+        if not len(candidates):
+            return (False, None)
+        candidate_messages = [other_messages[k] for k in candidates]
         
-        if closest_conflict:
+        # The ego trajectory is checked against every candidate at once
+        ego_traj = vehicle.compute_trajectory(dt, self.prediction_horizon)
+        others = self._stack_message_trajectories(candidate_messages, dt)
+        ttc = self.batch_predict_collisions(ego_traj, others, dt)
+        
+        closest = int(np.argmin(ttc))
+        if ttc[closest] < 2.0:  # collision within 2 seconds
+            closest_conflict = candidate_messages[closest]
             # Simple right-of-way: vehicle with lower ID has priority
             # (in real system, could use other rules like distance to intersection)
             if vehicle.id > closest_conflict.sender_id:
@@ -85,11 +167,14 @@ class ConflictResolver:
     
     def resolve_intersection_conflict(self, vehicle: Vehicle, 
                                      other_messages: List[V2VMessage],
-                                     dt: float):
+                                     dt: float,
+                                     d2: Optional[np.ndarray] = None):
         """
         Resolve conflicts at intersections
         """
-        should_yield, yield_to = self.should_yield(vehicle, other_messages, dt)
+        if d2 is None:
+            d2 = self.message_distances_sq(vehicle, other_messages)
+        should_yield, yield_to = self.should_yield(vehicle, other_messages, dt, d2=d2)
         
         if should_yield:
             vehicle.is_yielding = True
@@ -101,26 +186,25 @@ class ConflictResolver:
             # Check if we can resume normal speed
             if vehicle.is_yielding and vehicle.yield_target == yield_to:
                 # Clear yield state if threat has passed
-                dist_to_threat = None
-                for msg in other_messages:
+                dist2_to_threat = None
+                for k, msg in enumerate(other_messages):
                     if msg.sender_id == yield_to:
-                        import numpy as np
-                        dist_to_threat = np.sqrt((vehicle.x - msg.position[0])**2 + 
-                                                (vehicle.y - msg.position[1])**2)
+                        dist2_to_threat = d2[k]
                         break
                 
-                if dist_to_threat is None or dist_to_threat > self.safety_buffer * 3:
+                if dist2_to_threat is None or dist2_to_threat > self._buf2_clear:
                     vehicle.is_yielding = False
                     vehicle.yield_target = None
                     vehicle.intent = Intent.STRAIGHT
     
     def resolve_merge_conflict(self, vehicle: Vehicle, 
                               other_messages: List[V2VMessage],
-                              dt: float):
+                              dt: float,
+                              d2: Optional[np.ndarray] = None):
         """
         Resolve conflicts during lane merges
         """
-        should_yield, yield_to = self.should_yield(vehicle, other_messages, dt)
+        should_yield, yield_to = self.should_yield(vehicle, other_messages, dt, d2=d2)
         
         if should_yield:
             vehicle.intent = Intent.MERGE
@@ -132,17 +216,26 @@ class ConflictResolver:
             vehicle.intent = Intent.STRAIGHT
             vehicle.is_yielding = False
     
+    def message_distances_sq(self, vehicle: Vehicle, messages: List[V2VMessage]) -> np.ndarray:
+        """Squared distances from the vehicle to each message position"""
+        positions = np.array([message.position for message in messages],
+                             dtype=np.float64).reshape(-1, 2)
+        delta = positions - (vehicle.x, vehicle.y)
+        return (delta * delta).sum(axis=1)
+    
     def check_proximity_collision(self, vehicle: Vehicle,
                                   other_messages: List[V2VMessage],
-                                  dt: float):
+                                  dt: float,
+                                  d2: Optional[np.ndarray] = None):
         """
         General proximity-based collision avoidance
+        d2 optionally holds the squared distances to the message positions
         """
-        for message in other_messages:
-            dist = np.sqrt((vehicle.x - message.position[0])**2 + 
-                          (vehicle.y - message.position[1])**2)
+        if other_messages:
+            if d2 is None:
+                d2 = self.message_distances_sq(vehicle, other_messages)
             
-            if dist < self.safety_buffer * 1.5:  # too close
+            if (d2 < self._buf2_prox).any():  # too close
                 # Emergency braking
                 vehicle.decelerate(dt, target_speed=0.0)
                 vehicle.intent = Intent.STOP
@@ -151,4 +244,3 @@ class ConflictResolver:
         # If no immediate danger, resume normal operation
         if vehicle.intent == Intent.STOP and not vehicle.is_yielding:
             vehicle.intent = Intent.STRAIGHT
-
@@ -1,5 +1,8 @@
+import functools
+import math
 import numpy as np
-from typing import List, Tuple, Optional, Dict
+from scipy.spatial import cKDTree
+from typing import List, Tuple, Optional
 from simulation.map import Map
 import heapq
 
@@ -9,23 +12,44 @@ class PathFinder:
     
     def __init__(self, map_obj: Map):
         self.map = map_obj
+        
+        # Node-index paths are cached per (start, end) pair; many vehicles share endpoints
+        self._find_node_path = functools.lru_cache(maxsize=1024)(self._search_node_path)
+        
+        # KD-tree over node coordinates for nearest-node queries
+        self._kdtree = None
+        self._map_version = None
+        self._sync_with_map()
+    
+    def _sync_with_map(self):
+        """Rebuild the KD-tree and drop cached paths if the map has changed"""
+        self.map.ensure_arrays()
+        if self._map_version != self.map.version:
+            self._kdtree = cKDTree(self.map.xy) if len(self.map.xy) else None
+            self._find_node_path.cache_clear()
+            self._map_version = self.map.version
+    
+    def heuristic(self, node1_idx: int, node2_idx: int) -> float:
+        """Heuristic function for A* (Euclidean distance between node indices)"""
+        xy = self.map.xy
+        return math.hypot(xy[node1_idx, 0] - xy[node2_idx, 0],
+                          xy[node1_idx, 1] - xy[node2_idx, 1])
     
-    def heuristic(self, node1_id: int, node2_id: int) -> float:
-        """Heuristic function for A* (Euclidean distance)"""
-        return self.map.distance(node1_id, node2_id)
+    def _closest_index(self, x: float, y: float) -> Optional[int]:
+        """Find the array index of the closest node to a given position"""
+        self._sync_with_map()
+        if self._kdtree is None:
+            return None
+        
+        _, idx = self._kdtree.query([x, y])
+        return int(idx)
     
     def find_closest_node(self, x: float, y: float) -> Optional[int]:
         """Find the closest node to a given position"""
-        min_dist = float('inf')
-        closest_node = None
-        
-        for node_id, node in self.map.nodes.items():
-            dist = np.sqrt((node.x - x)**2 + (node.y - y)**2)
-            if dist < min_dist:
-                min_dist = dist
-                closest_node = node_id
-        
-        return closest_node
+        idx = self._closest_index(x, y)
+        if idx is None:
+            return None
+        return int(self.map.node_ids[idx])
     
     def find_path(self, start_pos: Tuple[float, float], 
                   end_pos: Tuple[float, float]) -> List[Tuple[float, float]]:
@@ -33,8 +57,8 @@ class PathFinder:
         Find path from start to end using A* algorithm
         Returns list of (x, y) positions
         """
-        start_node = self.find_closest_node(start_pos[0], start_pos[1])
-        end_node = self.find_closest_node(end_pos[0], end_pos[1])
+        start_node = self._closest_index(start_pos[0], start_pos[1])
+        end_node = self._closest_index(end_pos[0], end_pos[1])
         
         if start_node is None or end_node is None:
             # Fallback: direct path if no nodes found
@@ -43,42 +67,67 @@ class PathFinder:
         if start_node == end_node:
             return [end_pos]
         
-        # A* algorithm
+        node_path = self._find_node_path(start_node, end_node)
+        if not node_path:
+            # No path found
+            return []
+        
+        xy = self.map.xy
+        path_nodes = [(float(xy[node, 0]), float(xy[node, 1])) for node in node_path]
+        
+        # Add exact end position
+        path_nodes[-1] = end_pos
+        return path_nodes
+    
+    def _search_node_path(self, start_node: int, end_node: int) -> Tuple[int, ...]:
+        """
+        A* search between two node indices
+        Returns the node indices along the path, or an empty tuple if unreachable
+        """
+        xy = self.map.xy
+        adj_indptr = self.map.adj_indptr
+        adj_indices = self.map.adj_indices
+        adj_weights = self.map.adj_weights
+        
+        # A* algorithm over node indices, with per-node scores in flat arrays
         # Use priority queue for open set
-        open_set = [(0, start_node)]
-        came_from: Dict[int, Optional[int]] = {start_node: None}
-        g_score: Dict[int, float] = {start_node: 0}
-        f_score: Dict[int, float] = {start_node: self.heuristic(start_node, end_node)}
+        num_nodes = len(xy)
+        came_from = np.full(num_nodes, -1, dtype=np.int64)
+        g_score = np.full(num_nodes, np.inf)
+        f_score = np.full(num_nodes, np.inf)
+        g_score[start_node] = 0.0
+        f_score[start_node] = self.heuristic(start_node, end_node)
+        open_set = [(f_score[start_node], start_node)]
         
         while open_set:
-            current = heapq.heappop(open_set)[1]
+            f, current = heapq.heappop(open_set)
             
             if current == end_node:
                 # Reconstruct path
-                path_nodes = []
+                node_path = []
                 node = current
-                while node is not None:
-                    pos = self.map.get_node_position(node)
-                    if pos:
-                        path_nodes.append(pos)
-                    node = came_from.get(node)
-                path_nodes.reverse()
-                
-                # Add exact end position
-                path_nodes[-1] = end_pos
-                return path_nodes
+                while node != -1:
+                    node_path.append(int(node))
+                    node = came_from[node]
+                node_path.reverse()
+                return tuple(node_path)
+            
+            # Skip stale heap entries superseded by a cheaper push
+            if f > f_score[current]:
+                continue
             
-            for neighbor_id in self.map.get_neighbors(current):
-                tentative_g = g_score[current] + self.map.distance(current, neighbor_id)
+            for k in range(adj_indptr[current], adj_indptr[current + 1]):
+                neighbor = int(adj_indices[k])
+                tentative_g = g_score[current] + adj_weights[k]
                 
-                if neighbor_id not in g_score or tentative_g < g_score[neighbor_id]:
-                    came_from[neighbor_id] = current
-                    g_score[neighbor_id] = tentative_g
-                    f_score[neighbor_id] = tentative_g + self.heuristic(neighbor_id, end_node)
-                    heapq.heappush(open_set, (f_score[neighbor_id], neighbor_id))
+                if tentative_g < g_score[neighbor]:
+                    came_from[neighbor] = current
+                    g_score[neighbor] = tentative_g
+                    f_score[neighbor] = tentative_g + self.heuristic(neighbor, end_node)
+                    heapq.heappush(open_set, (f_score[neighbor], neighbor))
         
         # No path found
-        return []
+        return ()
     
     def find_path_smooth(self, start_pos: Tuple[float, float], 
                         end_pos: Tuple[float, float]) -> List[Tuple[float, float]]:
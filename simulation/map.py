@@ -1,10 +1,13 @@
-import json
+import orjson
+import math
 import numpy as np
 from typing import List, Tuple, Dict, Optional
 
 
 class RoadNode:
     """Represents a node in the road network"""
+    __slots__ = ('id', 'x', 'y', 'connections')
+    
     def __init__(self, node_id: int, x: float, y: float):
         self.id = node_id
         self.x = x
@@ -14,10 +17,14 @@ class RoadNode:
 
 class RoadEdge:
     """Represents an edge/lane between two nodes"""
-    def __init__(self, from_node: int, to_node: int, width: float = 1.0):
+    __slots__ = ('from_node', 'to_node', 'width', 'weight')
+    
+    def __init__(self, from_node: int, to_node: int, width: float = 1.0,
+                 weight: float = 0.0):
         self.from_node = from_node
         self.to_node = to_node
         self.width = width
+        self.weight = weight  # edge length, used as the path cost
 
 
 class Map:
@@ -31,15 +38,60 @@ class Map:
         self.destinations: List[Tuple[float, float]] = []
         self.bounds = (0, 0, 100, 100)  # min_x, min_y, max_x, max_y
         
+        # Structure-of-arrays view of the graph, indexed by compact node index
+        self.node_ids = np.empty(0, dtype=np.int64)  # index -> node ID
+        self.xy = np.empty((0, 2))  # (N, 2) node positions
+        self.adj_indptr = np.zeros(1, dtype=np.int64)  # CSR adjacency
+        self.adj_indices = np.empty(0, dtype=np.int64)
+        self.adj_weights = np.empty(0)
+        self._id2idx: Dict[int, int] = {}
+        self._arrays_stale = False
+        self.version = 0  # bumped on every array rebuild so caches can invalidate
+        
     def add_node(self, node_id: int, x: float, y: float):
         """Add a node to the map"""
         self.nodes[node_id] = RoadNode(node_id, x, y)
+        self._arrays_stale = True
         
     def add_edge(self, from_node: int, to_node: int, width: float = 1.0):
         """Add an edge between two nodes"""
         if from_node in self.nodes and to_node in self.nodes:
-            self.edges.append(RoadEdge(from_node, to_node, width))
+            src, dst = self.nodes[from_node], self.nodes[to_node]
+            weight = math.hypot(dst.x - src.x, dst.y - src.y)
+            self.edges.append(RoadEdge(from_node, to_node, width, weight))
             self.nodes[from_node].connections.append(to_node)
+            self._arrays_stale = True
+    
+    def build_arrays(self):
+        """Build the node position arrays and CSR adjacency from the node dict"""
+        self.node_ids = np.array(list(self.nodes.keys()), dtype=np.int64)
+        self._id2idx = {node_id: idx for idx, node_id in enumerate(self.nodes.keys())}
+        self.xy = np.array([[node.x, node.y] for node in self.nodes.values()],
+                           dtype=np.float64).reshape(-1, 2)
+        
+        # Neighbors of index i are adj_indices[adj_indptr[i]:adj_indptr[i + 1]],
+        # grouped by source with the edge insertion order kept inside each row
+        sources = np.array([self._id2idx[edge.from_node] for edge in self.edges], dtype=np.int64)
+        targets = np.array([self._id2idx[edge.to_node] for edge in self.edges], dtype=np.int64)
+        weights = np.array([edge.weight for edge in self.edges], dtype=np.float64)
+        order = np.argsort(sources, kind='stable')
+        counts = np.bincount(sources, minlength=len(self.node_ids))
+        self.adj_indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self.adj_indices = targets[order]
+        self.adj_weights = weights[order]
+        
+        self._arrays_stale = False
+        self.version += 1
+    
+    def ensure_arrays(self):
+        """Rebuild the array view if nodes or edges were added since the last build"""
+        if self._arrays_stale:
+            self.build_arrays()
+    
+    def index_of(self, node_id: int) -> Optional[int]:
+        """Get the compact array index of a node"""
+        self.ensure_arrays()
+        return self._id2idx.get(node_id)
     
     def get_node_position(self, node_id: int) -> Optional[Tuple[float, float]]:
         """Get position of a node"""
@@ -49,23 +101,26 @@ class Map:
     
     def get_neighbors(self, node_id: int) -> List[int]:
         """Get connected neighbor nodes"""
-        if node_id in self.nodes:
-            return self.nodes[node_id].connections
+        idx = self.index_of(node_id)
+        if idx is not None:
+            neighbors = self.adj_indices[self.adj_indptr[idx]:self.adj_indptr[idx + 1]]
+            return self.node_ids[neighbors].tolist()
         return []
     
     def distance(self, node1_id: int, node2_id: int) -> float:
         """Calculate Euclidean distance between two nodes"""
-        pos1 = self.get_node_position(node1_id)
-        pos2 = self.get_node_position(node2_id)
-        if pos1 and pos2:
-            return np.sqrt((pos1[0] - pos2[0])**2 + (pos1[1] - pos2[1])**2)
+        idx1 = self.index_of(node1_id)
+        idx2 = self.index_of(node2_id)
+        if idx1 is not None and idx2 is not None:
+            xy = self.xy
+            return math.hypot(xy[idx1, 0] - xy[idx2, 0], xy[idx1, 1] - xy[idx2, 1])
         return float('inf')
     
     @staticmethod
     def load_from_json(filepath: str) -> 'Map':
         """Load map from JSON file"""
-        with open(filepath, 'r') as f:
-            data = json.load(f)
+        with open(filepath, 'rb') as f:
+            data = orjson.loads(f.read())
         
         map_obj = Map()
         
@@ -95,5 +150,7 @@ class Map:
             ys = [node.y for node in map_obj.nodes.values()]
             map_obj.bounds = (min(xs) - 5, min(ys) - 5, max(xs) + 5, max(ys) + 5)
         
+        map_obj.build_arrays()
+        
         return map_obj
 
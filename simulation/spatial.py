@@ -0,0 +1,54 @@
+import numpy as np
+from collections import defaultdict
+from typing import List, Dict, Tuple
+
+
+class SpatialHash:
+    """
+    Uniform grid that buckets points by cell for fixed-radius neighbor queries
+    With cell_size equal to the query radius, every neighbor lies in the 3x3
+    block of cells around the query point
+    """
+    
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size if cell_size > 0 else 1.0
+        self.buckets: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self._cells = np.empty((0, 2), dtype=np.int64)
+    
+    def cells_of(self, positions: np.ndarray) -> np.ndarray:
+        """Get the (cx, cy) grid cell of every row of an (N, 2) positions array"""
+        return np.floor(positions / self.cell_size).astype(np.int64)
+    
+    def rebuild(self, positions: np.ndarray):
+        """Rebuild the grid from an (N, 2) positions array, storing row indices"""
+        self.buckets.clear()
+        self._cells = self.cells_of(positions)
+        for row, (cx, cy) in enumerate(self._cells.tolist()):
+            self.buckets[(cx, cy)].append(row)
+    
+    def query_cell(self, cx: int, cy: int) -> List[int]:
+        """
+        Get candidate rows in the 3x3 block of cells around a cell
+        Candidates still need an exact distance check
+        """
+        candidates = []
+        for gx in (cx - 1, cx, cx + 1):
+            for gy in (cy - 1, cy, cy + 1):
+                bucket = self.buckets.get((gx, gy))
+                if bucket:
+                    candidates.extend(bucket)
+        return candidates
+    
+    def query_radius(self, positions: np.ndarray, row: int, radius: float) -> np.ndarray:
+        """
+        Get the rows within radius of positions[row], excluding row itself
+        positions must be the array passed to the last rebuild
+        Grid candidates are confirmed with an exact squared-distance check
+        Returns the rows sorted in ascending order
+        """
+        cx, cy = self._cells[row].tolist()
+        candidates = np.array(sorted(self.query_cell(cx, cy)), dtype=np.int64)
+        delta = positions[candidates] - positions[row]
+        d2 = (delta * delta).sum(axis=1)
+        keep = (d2 <= radius * radius) & (candidates != row)
+        return candidates[keep]
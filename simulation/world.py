@@ -1,12 +1,20 @@
 import numpy as np
-import json
+import orjson
+from scipy.spatial import cKDTree
 from typing import List, Dict, Optional, Tuple
 from simulation.map import Map
+from simulation.spatial import SpatialHash
 from vehicles.vehicle import Vehicle
+from vehicles.state import VehicleState, MAX_VEHICLES
+from vehicles.kernels import step_all, constant_velocity_trajectories
 from planning.pathfinder import PathFinder
 from planning.conflict_resolver import ConflictResolver
 from v2v.comm_bus import CommunicationBus, V2VMessage
 
+# Fleets at least this large use a KD-tree instead of the grid for neighbor queries
+KDTREE_MIN_VEHICLES = 500
+COLLISION_DISTANCE = 1.5
+
 
 class World:
     """Main simulation world that manages all entities"""
@@ -14,21 +22,56 @@ class World:
     def __init__(self, map_obj: Map, use_v2v: bool = True,
                  broadcast_radius: float = 50.0,
                  latency: float = 0.0,
-                 packet_drop_rate: float = 0.0):
+                 packet_drop_rate: float = 0.0,
+                 seed: Optional[int] = None):
         self.map = map_obj
         self.use_v2v = use_v2v
         self.vehicles: Dict[int, Vehicle] = {}
+        # Kinematic state of every vehicle; each vehicle knows its own row
+        self.state = VehicleState(MAX_VEHICLES)
         self.pathfinder = PathFinder(map_obj)
         self.conflict_resolver = ConflictResolver()
         self.comm_bus = CommunicationBus(broadcast_radius, latency, packet_drop_rate)
         
+        # Own generator for packet loss instead of the global NumPy state
+        self._rng = np.random.default_rng(seed)
+        
+        # Packed vehicle positions and in-range neighbor lists, refreshed lazily
+        # whenever vehicles move or are added
+        self._ids: List[int] = []
+        self._row_of: Dict[int, int] = {}
+        self._pos = np.empty((0, 2), dtype=np.float32)
+        self._proximity_stale = True
+        
+        # One V2V message per vehicle, shared by every receiver and by rendering
+        self._current_messages: Dict[int, V2VMessage] = {}
+        self._messages_stale = True
+        
+        # Grid over vehicle rows with one broadcast radius per cell
+        self.spatial_hash = SpatialHash(broadcast_radius)
+        
+        # CSR neighbor lists: receivers of row i are _nbr_indices[_nbr_indptr[i]:_nbr_indptr[i + 1]]
+        self._nbr_indptr = np.zeros(1, dtype=np.int64)
+        self._nbr_indices = np.empty(0, dtype=np.int64)
+        
         self.time = 0.0
         self.dt = 0.1  # time step in seconds
         self.step_count = 0
     
     def add_vehicle(self, vehicle: Vehicle, destination: Optional[Tuple[float, float]] = None):
         """Add a vehicle to the world"""
+        # A replaced vehicle hands its row to the new one and gets its own state back
+        existing = self.vehicles.get(vehicle.id)
+        if existing is None:
+            row = self.state.add(vehicle.x, vehicle.y, vehicle.heading, vehicle.speed)
+        else:
+            row = existing.row
+            if existing is not vehicle:
+                existing.detach()
+        vehicle.attach(self.state, row)
         self.vehicles[vehicle.id] = vehicle
+        self._proximity_stale = True
+        self._messages_stale = True
         
         # Plan initial path if destination provided
         if destination:
@@ -44,43 +87,157 @@ class World:
         self.comm_bus.update_time(self.dt)
         
         # Update vehicle trajectories
-        for vehicle in self.vehicles.values():
-            vehicle.update_trajectory(self.dt)
+        self._update_trajectories()
+        self._messages_stale = True
         
         # V2V communication
         if self.use_v2v:
             self._process_v2v_communication()
         
-        # Update vehicle behaviors
+        # Deliver messages and update vehicle behaviors in one pass; each vehicle's
+        # conflict handling and control touch only that vehicle
+        use_v2v = self.use_v2v
         for vehicle in self.vehicles.values():
+            if use_v2v:
+                messages = self.comm_bus.get_messages_for_vehicle(vehicle.id)
+                self._handle_received_messages(vehicle, messages)
             vehicle.update_control(self.dt)
         
         # Update positions
-        for vehicle in self.vehicles.values():
-            vehicle.update_position(self.dt)
+        self._update_positions()
+        self._proximity_stale = True
         
         # Check for collisions
         self._check_collisions()
+        self._messages_stale = True
+    
+    def _live_rows(self) -> np.ndarray:
+        """
+        State rows of the vehicles in self.vehicles, in dict order
+        Index k of any per-vehicle array built from these rows is the k-th vehicle
+        """
+        return np.fromiter((vehicle.row for vehicle in self.vehicles.values()),
+                           dtype=np.int64, count=len(self.vehicles))
+    
+    def _gather_positions(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Copy the x and y of the given state rows"""
+        return self.state.x[rows], self.state.y[rows]
+    
+    def _update_trajectories(self):
+        """Predict every vehicle's trajectory in one compiled pass"""
+        if not self.vehicles:
+            return
+        
+        vehicles = list(self.vehicles.values())
+        rows = self._live_rows()
+        horizon = max(v.trajectory_horizon for v in vehicles)
+        trajectories = np.empty((len(rows), horizon, 2), dtype=np.float32)
+        state = self.state
+        constant_velocity_trajectories(rows, state.x, state.y, state.heading, state.speed,
+                                       self.dt, trajectories)
+        
+        for k, vehicle in enumerate(vehicles):
+            vehicle.set_trajectory(trajectories[k, :vehicle.trajectory_horizon], self.dt)
+    
+    def _update_positions(self):
+        """Advance every vehicle at its current velocity in one compiled pass"""
+        if not self.vehicles:
+            return
+        
+        state = self.state
+        step_all(self._live_rows(), state.x, state.y, state.heading, state.speed,
+                 state.vx, state.vy, self.dt)
+    
+    def _ensure_proximity(self):
+        """Repack vehicle positions and rebuild the in-range neighbor lists"""
+        if not self._proximity_stale:
+            return
+        
+        self._ids = list(self.vehicles.keys())
+        self._row_of = {vid: row for row, vid in enumerate(self._ids)}
+        x, y = self._gather_positions(self._live_rows())
+        self._pos = np.column_stack((x, y)).astype(np.float32)
+        
+        radius = self.comm_bus.broadcast_radius
+        if len(self._ids) >= KDTREE_MIN_VEHICLES:
+            self._build_neighbors_kdtree(radius)
+            self._proximity_stale = False
+            return
+        
+        # Grid lookup keeps the candidate set local instead of checking all N² pairs
+        self.spatial_hash.rebuild(self._pos)
+        indptr = [0]
+        indices = []
+        for row in range(len(self._ids)):
+            cols = self.spatial_hash.query_radius(self._pos, row, radius)
+            indices.append(cols)
+            indptr.append(indptr[-1] + len(cols))
+        
+        self._nbr_indptr = np.array(indptr, dtype=np.int64)
+        self._nbr_indices = np.concatenate(indices) if indices else np.empty(0, dtype=np.int64)
+        self._proximity_stale = False
+    
+    def _build_neighbors_kdtree(self, radius: float):
+        """Fill the neighbor lists from one KD-tree pair query over the packed positions"""
+        pairs = cKDTree(self._pos).query_pairs(radius, output_type='ndarray')
+        
+        # Each pair is listed under both rows, ordered by (row, col) like the grid path
+        rows = np.concatenate((pairs[:, 0], pairs[:, 1]))
+        cols = np.concatenate((pairs[:, 1], pairs[:, 0]))
+        order = np.lexsort((cols, rows))
+        rows, cols = rows[order], cols[order]
+        
+        delta = self._pos[cols] - self._pos[rows]
+        d2 = (delta * delta).sum(axis=1)
+        keep = d2 <= radius * radius
+        rows, cols = rows[keep], cols[keep]
+        
+        counts = np.bincount(rows, minlength=len(self._ids))
+        self._nbr_indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self._nbr_indices = cols.astype(np.int64)
     
     def _check_collisions(self):
         """Check for collisions between vehicles"""
         vehicle_list = list(self.vehicles.values())
-        for i, v1 in enumerate(vehicle_list):
-            for v2 in vehicle_list[i+1:]:
-                dist = np.sqrt((v1.x - v2.x)**2 + (v1.y - v2.y)**2)
-                if dist < 1.5:  # collision threshold
-                    # Stop both vehicles
-                    v1.stop()
-                    v2.stop()
+        x, y = self._gather_positions(self._live_rows())
+        if len(x) < 2:
+            return
+        
+        if len(x) >= KDTREE_MIN_VEHICLES:
+            # Only pairs the tree reports as close, instead of an N x N matrix
+            pairs = cKDTree(np.column_stack((x, y))).query_pairs(COLLISION_DISTANCE,
+                                                                 output_type='ndarray')
+            dx = x[pairs[:, 0]] - x[pairs[:, 1]]
+            dy = y[pairs[:, 0]] - y[pairs[:, 1]]
+            pairs = pairs[dx * dx + dy * dy < COLLISION_DISTANCE * COLLISION_DISTANCE]
+            colliding = np.unique(pairs)
+        else:
+            # All pairwise squared distances straight from the state arrays
+            dx = x[:, None] - x[None, :]
+            dy = y[:, None] - y[None, :]
+            close = dx * dx + dy * dy < COLLISION_DISTANCE * COLLISION_DISTANCE
+            np.fill_diagonal(close, False)
+            colliding = np.flatnonzero(close.any(axis=1))
+        
+        # Stop every vehicle involved in a collision
+        for k in colliding:
+            vehicle_list[k].stop()
     
-    def _process_v2v_communication(self):
-        """Process V2V message broadcasting and delivery"""
-        # Collect all vehicle positions
-        vehicle_positions = {vid: (v.x, v.y) for vid, v in self.vehicles.items()}
+    def _ensure_messages(self):
+        """
+        Build each vehicle's V2V message once for the current state
+        Vehicles with nobody in range have no receivers and get no message
+        """
+        if not self._messages_stale:
+            return
         
-        # Broadcast messages from each vehicle
-        for vehicle in self.vehicles.values():
-            message = V2VMessage(
+        self._ensure_proximity()
+        senders = np.flatnonzero(np.diff(self._nbr_indptr)).tolist()
+        vehicles = [self.vehicles[self._ids[row]] for row in senders]
+        
+        # Messages are read-only snapshots, so receivers can share references
+        self._current_messages = {
+            vehicle.id: V2VMessage(
                 sender_id=vehicle.id,
                 position=(vehicle.x, vehicle.y),
                 velocity=vehicle.get_velocity(),
@@ -90,58 +247,87 @@ class World:
                 planned_trajectory=vehicle.planned_trajectory,
                 timestamp=self.time
             )
-            self.comm_bus.broadcast(message, (vehicle.x, vehicle.y), vehicle_positions)
+            for vehicle in vehicles
+        }
+        self._messages_stale = False
+    
+    def _process_v2v_communication(self):
+        """
+        Broadcast every vehicle's V2V message to its in-range receivers
+        Delivery happens per vehicle in update, right before its control step
+        """
+        self._ensure_proximity()
+        self._ensure_messages()
         
-        # Deliver messages to vehicles
-        for vehicle in self.vehicles.values():
-            messages = self.comm_bus.get_messages_for_vehicle(vehicle.id)
-            self._handle_received_messages(vehicle, messages)
+        # Packet-loss check for every in-range (sender, receiver) pair at once
+        delivered = self._rng.random(len(self._nbr_indices)) >= self.comm_bus.packet_drop_rate
+        
+        # Broadcast messages from each vehicle with at least one receiver in range
+        for row, vehicle_id in enumerate(self._ids):
+            start, end = self._nbr_indptr[row], self._nbr_indptr[row + 1]
+            if start == end:
+                continue
+            message = self._current_messages[vehicle_id]
+            kept = delivered[start:end]
+            receiver_ids = [self._ids[col] for col in self._nbr_indices[start:end][kept]]
+            self.comm_bus.broadcast(message, receiver_ids, int(len(kept) - kept.sum()))
     
     def _handle_received_messages(self, vehicle: Vehicle, messages: List[V2VMessage]):
         """Handle V2V messages received by a vehicle"""
         if not messages:
             return
         
+        # Distances are computed once and shared by every resolver check
+        # (positions do not change during the V2V phase)
+        d2 = self.conflict_resolver.message_distances_sq(vehicle, messages)
+        
         # Resolve conflicts using received messages
-        self.conflict_resolver.resolve_intersection_conflict(vehicle, messages, self.dt)
-        self.conflict_resolver.resolve_merge_conflict(vehicle, messages, self.dt)
-        self.conflict_resolver.check_proximity_collision(vehicle, messages, self.dt)
+        self.conflict_resolver.resolve_intersection_conflict(vehicle, messages, self.dt, d2)
+        self.conflict_resolver.resolve_merge_conflict(vehicle, messages, self.dt, d2)
+        self.conflict_resolver.check_proximity_collision(vehicle, messages, self.dt, d2)
+    
+    def snapshot(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get the current vehicle state as arrays, one row per vehicle
+        Returns (ids, xy, headings, speeds)
+        """
+        ids = np.fromiter(self.vehicles.keys(), dtype=np.int64, count=len(self.vehicles))
+        rows = self._live_rows()
+        x, y = self._gather_positions(rows)
+        return ids, np.column_stack((x, y)), self.state.heading[rows], self.state.speed[rows]
+    
+    def neighbor_pairs(self) -> np.ndarray:
+        """
+        Get every pair of vehicles within broadcast range of each other, each once
+        Returns an (M, 2) array of (i, j) with i < j, indexing vehicles in snapshot order
+        """
+        self._ensure_proximity()
+        rows = np.repeat(np.arange(len(self._ids), dtype=np.int64), np.diff(self._nbr_indptr))
+        cols = self._nbr_indices
+        upper = rows < cols
+        return np.column_stack((rows[upper], cols[upper]))
     
     def get_nearby_vehicles_for_rendering(self, vehicle_id: int) -> List[V2VMessage]:
         """Get nearby vehicles for visualization (used in baseline mode too)"""
         if vehicle_id not in self.vehicles:
             return []
         
-        vehicle = self.vehicles[vehicle_id]
         nearby = []
         
-        for other_id, other_vehicle in self.vehicles.items():
-            if other_id == vehicle_id:
-                continue
-            
-            dist = np.sqrt((vehicle.x - other_vehicle.x)**2 + 
-                          (vehicle.y - other_vehicle.y)**2)
-            
-            if dist <= self.comm_bus.broadcast_radius:
-                message = V2VMessage(
-                    sender_id=other_vehicle.id,
-                    position=(other_vehicle.x, other_vehicle.y),
-                    velocity=other_vehicle.get_velocity(),
-                    heading=other_vehicle.heading,
-                    speed=other_vehicle.speed,
-                    intent=other_vehicle.intent,
-                    planned_trajectory=other_vehicle.planned_trajectory,
-                    timestamp=self.time
-                )
-                nearby.append(message)
+        # The shared neighbor list holds every vehicle in range
+        self._ensure_proximity()
+        self._ensure_messages()
+        row = self._row_of[vehicle_id]
+        for col in self._nbr_indices[self._nbr_indptr[row]:self._nbr_indptr[row + 1]]:
+            nearby.append(self._current_messages[self._ids[col]])
         
         return nearby
 
 
 def load_scenario(filepath: str) -> List[Dict]:
     """Load scenario from JSON file"""
-    with open(filepath, 'r') as f:
-        data = json.load(f)
+    with open(filepath, 'rb') as f:
+        data = orjson.loads(f.read())
     return data.get('vehicles', [])
 
 
@@ -0,0 +1,24 @@
+import math
+import unittest
+from vehicles.vehicle import normalize_angle, TWO_PI
+
+
+class TestNormalizeAngle(unittest.TestCase):
+    
+    def test_in_range_unchanged(self):
+        self.assertEqual(normalize_angle(1.0), 1.0)
+    
+    def test_wraps_negative(self):
+        self.assertAlmostEqual(normalize_angle(-math.pi / 2), 1.5 * math.pi)
+    
+    def test_wraps_above_two_pi(self):
+        self.assertAlmostEqual(normalize_angle(TWO_PI + 0.5), 0.5)
+    
+    def test_tiny_negative_stays_below_two_pi(self):
+        wrapped = normalize_angle(-1e-17)
+        self.assertGreaterEqual(wrapped, 0.0)
+        self.assertLess(wrapped, TWO_PI)
+
+
+if __name__ == '__main__':
+    unittest.main()
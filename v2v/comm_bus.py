@@ -1,21 +1,6 @@
-import numpy as np
-from typing import List, Dict, Optional, Tuple
-from dataclasses import dataclass
-from vehicles.vehicle import Intent
-import random
-
-
-@dataclass
-class V2VMessage:
-    """Message format for vehicle-to-vehicle communication"""
-    sender_id: int
-    position: Tuple[float, float]  # (x, y)
-    velocity: Tuple[float, float]  # (vx, vy)
-    heading: float  # radians
-    speed: float
-    intent: Intent
-    planned_trajectory: List[Tuple[float, float]]  # next N positions
-    timestamp: float
+from collections import defaultdict, deque
+from typing import List, Dict, Tuple, Deque
+from v2v.message import V2VMessage
 
 
 class CommunicationBus:
@@ -31,8 +16,11 @@ class CommunicationBus:
         self.latency = latency  # seconds
         self.packet_drop_rate = packet_drop_rate  # 0.0 to 1.0
         
-        # Message queues for delayed delivery
-        self.message_queue: List[Tuple[float, V2VMessage, int]] = []  # (delivery_time, message, receiver_id)
+        # Per-receiver FIFO inboxes for delayed delivery: (delivery_time, message)
+        # Latency is constant, so each inbox is already ordered by delivery time
+        self.inbox: Dict[int, Deque[Tuple[float, V2VMessage]]] = defaultdict(deque)
+        # Zero-latency messages skip the timed inbox and are handed over this step
+        self.ready: Dict[int, List[V2VMessage]] = defaultdict(list)
         self.current_time = 0.0
         
         # Statistics
@@ -44,52 +32,41 @@ class CommunicationBus:
         """Update simulation time"""
         self.current_time += dt
     
-    def broadcast(self, message: V2VMessage, sender_pos: Tuple[float, float],
-                  all_vehicles: Dict[int, Tuple[float, float]]) -> List[V2VMessage]:
+    def broadcast(self, message: V2VMessage, receiver_ids: List[int],
+                  num_dropped: int = 0):
         """
-        Broadcast a message to nearby vehicles
-        Returns list of messages that should be delivered (after latency/packet loss)
+        Queue a message for delivery to the given receivers
+        Range and packet-loss checks are done by the caller for all pairs at once;
+        receiver_ids are the in-range receivers that survived packet loss
+        The message is queued by reference and is never serialized here
         """
-        delivered_messages = []
+        self.messages_sent += len(receiver_ids) + num_dropped
+        self.messages_dropped += num_dropped
         
-        for vehicle_id, vehicle_pos in all_vehicles.items():
-            if vehicle_id == message.sender_id:
-                continue
-            
-            # Check if within broadcast radius
-            dist = np.sqrt((sender_pos[0] - vehicle_pos[0])**2 + 
-                          (sender_pos[1] - vehicle_pos[1])**2)
-            
-            if dist <= self.broadcast_radius:
-                self.messages_sent += 1
-                # Check packet drop
-                if random.random() > self.packet_drop_rate:
-                    # Calculate delivery time with latency
-                    delivery_time = self.current_time + self.latency
-                    self.message_queue.append((delivery_time, message, vehicle_id))
-                else:
-                    self.messages_dropped += 1
+        if self.latency <= 0:
+            for vehicle_id in receiver_ids:
+                self.ready[vehicle_id].append(message)
+            return
         
-        return delivered_messages
+        # Calculate delivery time with latency
+        delivery_time = self.current_time + self.latency
+        for vehicle_id in receiver_ids:
+            self.inbox[vehicle_id].append((delivery_time, message))
     
     def get_messages_for_vehicle(self, vehicle_id: int) -> List[V2VMessage]:
         """
         Get all messages that should be delivered to a vehicle at current time
         """
         messages = []
-        remaining_queue = []
+        inbox = self.inbox.get(vehicle_id)
+        while inbox and inbox[0][0] <= self.current_time:
+            messages.append(inbox.popleft()[1])
         
-        for delivery_time, message, receiver_id in self.message_queue:
-            if receiver_id == vehicle_id and delivery_time <= self.current_time:
-                messages.append(message)
-                self.messages_delivered += 1
-            else:
-                remaining_queue.append((delivery_time, message, receiver_id))
-        
-        self.message_queue = remaining_queue
+        messages.extend(self.ready.pop(vehicle_id, ()))
+        self.messages_delivered += len(messages)
         return messages
     
     def clear_queue(self):
         """Clear all pending messages"""
-        self.message_queue = []
-
+        self.inbox.clear()
+        self.ready.clear()
@@ -0,0 +1,64 @@
+import numpy as np
+from typing import Tuple, Dict, Any
+from vehicles.vehicle import Intent
+
+
+class V2VMessage:
+    """Message format for vehicle-to-vehicle communication"""
+    __slots__ = ('sender_id', 'position', 'velocity', 'heading', 'speed',
+                 'intent', 'planned_trajectory', 'timestamp')
+    
+    def __init__(self, sender_id: int,
+                 position: Tuple[float, float],
+                 velocity: Tuple[float, float],
+                 heading: float,
+                 speed: float,
+                 intent: Intent,
+                 planned_trajectory: np.ndarray,
+                 timestamp: float):
+        self.sender_id = sender_id
+        self.position = position  # (x, y)
+        self.velocity = velocity  # (vx, vy)
+        self.heading = heading  # radians
+        self.speed = speed
+        self.intent = intent
+        self.planned_trajectory = planned_trajectory  # next N positions, float32 shape (N, 2)
+        self.timestamp = timestamp
+    
+    def __reduce__(self):
+        # Pickle as a flat argument tuple for passing messages between processes
+        return (V2VMessage, (self.sender_id, self.position, self.velocity, self.heading,
+                             self.speed, self.intent, self.planned_trajectory, self.timestamp))
+    
+    # to_dict/from_dict are for logging only; the broadcast path passes messages by reference
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to a JSON-serializable dict"""
+        return {
+            'sender_id': self.sender_id,
+            'position': list(self.position),
+            'velocity': list(self.velocity),
+            'heading': self.heading,
+            'speed': self.speed,
+            'intent': self.intent.value,
+            'planned_trajectory': self.planned_trajectory.tolist(),
+            'timestamp': self.timestamp
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'V2VMessage':
+        """Create a message from a dict produced by to_dict"""
+        return cls(
+            sender_id=data['sender_id'],
+            position=tuple(data['position']),
+            velocity=tuple(data['velocity']),
+            heading=data['heading'],
+            speed=data['speed'],
+            intent=Intent(data['intent']),
+            planned_trajectory=np.array(data['planned_trajectory'],
+                                        dtype=np.float32).reshape(-1, 2),
+            timestamp=data['timestamp']
+        )
+    
+    def __repr__(self) -> str:
+        return (f"V2VMessage(sender_id={self.sender_id}, position={self.position}, "
+                f"speed={self.speed}, intent={self.intent}, timestamp={self.timestamp})")
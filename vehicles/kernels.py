@@ -0,0 +1,28 @@
+import math
+from numba import njit
+
+
+@njit(cache=True, fastmath=True)
+def step_all(rows, x, y, heading, speed, vx_out, vy_out, dt):
+    """Advance the vehicles in the given state rows one step at constant velocity, in place"""
+    for k in range(rows.shape[0]):
+        i = rows[k]
+        vx = speed[i] * math.cos(heading[i])
+        vy = speed[i] * math.sin(heading[i])
+        vx_out[i] = vx
+        vy_out[i] = vy
+        x[i] += vx * dt
+        y[i] += vy * dt
+
+
+@njit(cache=True, fastmath=True)
+def constant_velocity_trajectories(rows, x, y, heading, speed, dt, out):
+    """Fill out[k] (shape (H, 2)) with the next H predicted positions of the vehicle in rows[k]"""
+    for k in range(out.shape[0]):
+        i = rows[k]
+        vx = speed[i] * math.cos(heading[i])
+        vy = speed[i] * math.sin(heading[i])
+        for h in range(out.shape[1]):
+            t = (h + 1) * dt
+            out[k, h, 0] = x[i] + vx * t
+            out[k, h, 1] = y[i] + vy * t
@@ -0,0 +1,47 @@
+import numpy as np
+
+MAX_VEHICLES = 256
+
+
+class VehicleState:
+    """
+    Structure-of-arrays storage for vehicle kinematic state
+    Each vehicle owns one row; kernels operate on the leading count rows in place
+    """
+    
+    def __init__(self, capacity: int = MAX_VEHICLES):
+        capacity = max(1, capacity)
+        self.x = np.zeros(capacity, dtype=np.float64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.heading = np.zeros(capacity, dtype=np.float64)
+        self.speed = np.zeros(capacity, dtype=np.float64)
+        self.vx = np.zeros(capacity, dtype=np.float64)
+        self.vy = np.zeros(capacity, dtype=np.float64)
+        self.count = 0
+    
+    @property
+    def capacity(self) -> int:
+        return len(self.x)
+    
+    def add(self, x: float, y: float, heading: float, speed: float) -> int:
+        """Append a vehicle's state and return its row"""
+        if self.count == self.capacity:
+            self._grow(2 * self.capacity)
+        
+        row = self.count
+        self.x[row] = x
+        self.y[row] = y
+        self.heading[row] = heading
+        self.speed[row] = speed
+        self.vx[row] = 0.0
+        self.vy[row] = 0.0
+        self.count += 1
+        return row
+    
+    def _grow(self, capacity: int):
+        """Reallocate every array with a larger capacity, keeping existing rows"""
+        for name in ('x', 'y', 'heading', 'speed', 'vx', 'vy'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
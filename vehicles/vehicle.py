@@ -1,15 +1,20 @@
+import math
 import numpy as np
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Callable, Hashable
 from enum import Enum
+from vehicles.state import VehicleState
+
+
+TWO_PI = 2 * math.pi
 
 
 def normalize_angle(angle: float) -> float:
-    """Normalize angle to [0, 2*pi]"""
-    while angle < 0:
-        angle += 2 * np.pi
-    while angle >= 2 * np.pi:
-        angle -= 2 * np.pi
-    return angle
+    """Normalize angle to [0, 2*pi)"""
+    wrapped = angle - TWO_PI * math.floor(angle / TWO_PI)
+    # Tiny negative angles round up to exactly 2*pi
+    if wrapped >= TWO_PI:
+        wrapped -= TWO_PI
+    return wrapped
 
 
 class Intent(Enum):
@@ -22,15 +27,21 @@ class Intent(Enum):
 
 
 class Vehicle:
-    """Represents a single vehicle in the simulation"""
+    """
+    Represents a single vehicle in the simulation
+    Kinematic state (x, y, heading, speed) lives in a row of a VehicleState once
+    a world adopts the vehicle; until then it is kept in plain attributes
+    """
     
     def __init__(self, vehicle_id: int, x: float, y: float, 
                  heading: float = 0.0, speed: float = 0.0):
         self.id = vehicle_id
-        self.x = x
-        self.y = y
-        self.heading = heading  # radians
-        self.speed = speed  # units per second
+        self._state: Optional[VehicleState] = None
+        self.row: Optional[int] = None
+        self._x = x
+        self._y = y
+        self._heading = heading
+        self._speed = speed
         self.max_speed = 5.0
         self.acceleration = 2.0
         self.deceleration = 3.0
@@ -39,11 +50,20 @@ class Vehicle:
         self.path: List[Tuple[float, float]] = []
         self.current_path_index = 0
         self.destination: Optional[Tuple[float, float]] = None
+        # Screen-space path points for cached_path_points; redone when the path or view changes
+        self._path_screen_points: List[List[int]] = []
+        self._path_screen_view = None  # renderer view the points were made for
+        self._path_dirty = True
         
         # Intent and trajectory
         self.intent = Intent.STRAIGHT
-        self.planned_trajectory: List[Tuple[float, float]] = []  # next N positions
+        self.planned_trajectory: np.ndarray = np.empty((0, 2), dtype=np.float32)  # next N positions, shape (N, 2)
         self.trajectory_horizon = 10  # number of steps ahead to plan
+        self._trajectory_key = None  # state the cached trajectory was computed from
+        self._cached_trajectory: np.ndarray = self.planned_trajectory
+        
+        # Squared distance at which a waypoint counts as reached
+        self._waypoint_threshold_sq = 0.5 * 0.5
         
         # Behavior parameters
         self.aggressiveness = 0.5  # 0.0 = very cautious, 1.0 = aggressive
@@ -52,18 +72,88 @@ class Vehicle:
         # State
         self.is_yielding = False
         self.yield_target = None  # vehicle ID we're yielding to
+    
+    @property
+    def x(self) -> float:
+        if self._state is None:
+            return self._x
+        return self._state.x.item(self.row)
+    
+    @x.setter
+    def x(self, value: float):
+        if self._state is None:
+            self._x = value
+        else:
+            self._state.x[self.row] = value
+    
+    @property
+    def y(self) -> float:
+        if self._state is None:
+            return self._y
+        return self._state.y.item(self.row)
+    
+    @y.setter
+    def y(self, value: float):
+        if self._state is None:
+            self._y = value
+        else:
+            self._state.y[self.row] = value
+    
+    @property
+    def heading(self) -> float:
+        """Heading in radians"""
+        if self._state is None:
+            return self._heading
+        return self._state.heading.item(self.row)
+    
+    @heading.setter
+    def heading(self, value: float):
+        if self._state is None:
+            self._heading = value
+        else:
+            self._state.heading[self.row] = value
+    
+    @property
+    def speed(self) -> float:
+        """Speed in units per second"""
+        if self._state is None:
+            return self._speed
+        return self._state.speed.item(self.row)
+    
+    @speed.setter
+    def speed(self, value: float):
+        if self._state is None:
+            self._speed = value
+        else:
+            self._state.speed[self.row] = value
+    
+    def attach(self, state: VehicleState, row: int):
+        """Move this vehicle's kinematic state into a row of a shared VehicleState"""
+        state.x[row] = self.x
+        state.y[row] = self.y
+        state.heading[row] = self.heading
+        state.speed[row] = self.speed
+        self._state = state
+        self.row = row
+    
+    def detach(self):
+        """Move this vehicle's kinematic state out of its shared row into plain attributes"""
+        self._x, self._y = self.x, self.y
+        self._heading, self._speed = self.heading, self.speed
+        self._state = None
+        self.row = None
         
     def get_velocity(self) -> Tuple[float, float]:
         """Get velocity vector (vx, vy)"""
-        vx = self.speed * np.cos(self.heading)
-        vy = self.speed * np.sin(self.heading)
+        vx = self.speed * math.cos(self.heading)
+        vy = self.speed * math.sin(self.heading)
         return (vx, vy)
     
     def set_velocity(self, vx: float, vy: float):
         """Set velocity from vector"""
-        self.speed = np.sqrt(vx**2 + vy**2)
+        self.speed = math.hypot(vx, vy)
         if self.speed > 0:
-            self.heading = np.arctan2(vy, vx)
+            self.heading = math.atan2(vy, vx)
         self.speed = min(self.speed, self.max_speed)
     
     def update_position(self, dt: float):
@@ -76,6 +166,20 @@ class Vehicle:
         """Set the planned path"""
         self.path = path
         self.current_path_index = 0
+        self._path_dirty = True
+    
+    def cached_path_points(self, view_key: Hashable,
+                           compute: Callable[[List[Tuple[float, float]]], List[List[int]]]
+                           ) -> List[List[int]]:
+        """
+        Get the path converted to screen points by compute
+        The result is reused until the path changes or a different view_key is given
+        """
+        if self._path_dirty or self._path_screen_view != view_key:
+            self._path_screen_points = compute(self.path)
+            self._path_screen_view = view_key
+            self._path_dirty = False
+        return self._path_screen_points
     
     def get_next_waypoint(self) -> Optional[Tuple[float, float]]:
         """Get the next waypoint in the path"""
@@ -83,62 +187,78 @@ class Vehicle:
             return self.path[self.current_path_index]
         return None
     
-    def reached_waypoint(self, threshold: float = 0.5) -> bool:
-        """Check if we've reached the current waypoint"""
+    def reached_waypoint(self, threshold: Optional[float] = None) -> bool:
+        """Check if we've reached the current waypoint (default threshold 0.5)"""
         waypoint = self.get_next_waypoint()
         if waypoint is None:
             return True
         
-        dist = np.sqrt((self.x - waypoint[0])**2 + (self.y - waypoint[1])**2)
-        return dist < threshold
+        threshold_sq = self._waypoint_threshold_sq if threshold is None else threshold * threshold
+        dx = self.x - waypoint[0]
+        dy = self.y - waypoint[1]
+        return dx * dx + dy * dy < threshold_sq
     
     def advance_path(self):
         """Move to next waypoint in path"""
         if self.reached_waypoint():
             self.current_path_index += 1
     
-    def compute_trajectory(self, dt: float, steps: int = None) -> List[Tuple[float, float]]:
-        """Compute predicted trajectory for next N steps"""
+    def compute_trajectory(self, dt: float, steps: int = None) -> np.ndarray:
+        """
+        Compute predicted trajectory for next N steps as an (N, 2) float32 array
+        The result is cached and read-only; it is reused until the state changes
+        """
         if steps is None:
             steps = self.trajectory_horizon
         
-        trajectory = []
-        x, y = self.x, self.y
+        # Planning and conflict resolution ask for the same trajectory several times a tick
+        key = (self.x, self.y, self.heading, self.speed, dt, steps)
+        if key == self._trajectory_key:
+            return self._cached_trajectory
+        
         vx, vy = self.get_velocity()
         
         # Simple constant velocity prediction
-        for _ in range(steps):
-            x += vx * dt
-            y += vy * dt
-            trajectory.append((x, y))
+        t = np.arange(1, steps + 1, dtype=np.float32) * np.float32(dt)
+        trajectory = np.empty((steps, 2), dtype=np.float32)
+        trajectory[:, 0] = self.x + vx * t
+        trajectory[:, 1] = self.y + vy * t
+        trajectory.flags.writeable = False
         
+        self._trajectory_key = key
+        self._cached_trajectory = trajectory
         return trajectory
     
     def update_trajectory(self, dt: float):
         """Update planned trajectory"""
         self.planned_trajectory = self.compute_trajectory(dt)
     
+    def set_trajectory(self, trajectory: np.ndarray, dt: float):
+        """
+        Set a planned trajectory computed elsewhere (e.g. batched by the world)
+        It also becomes the cached result of compute_trajectory for the current state
+        """
+        trajectory.flags.writeable = False
+        self.planned_trajectory = trajectory
+        self._trajectory_key = (self.x, self.y, self.heading, self.speed, dt, len(trajectory))
+        self._cached_trajectory = trajectory
+    
     def steer_toward(self, target_x: float, target_y: float):
         """Steer toward a target position"""
         dx = target_x - self.x
         dy = target_y - self.y
-        dist = np.sqrt(dx**2 + dy**2)
-        
-        if dist < 0.1:  # already very close
+        if dx * dx + dy * dy < 0.1 * 0.1:  # already very close
             return
         
-        target_heading = np.arctan2(dy, dx)
+        target_heading = math.atan2(dy, dx)
         
         # Smooth heading change
         angle_diff = target_heading - self.heading
         # Normalize to [-pi, pi]
-        while angle_diff > np.pi:
-            angle_diff -= 2 * np.pi
-        while angle_diff < -np.pi:
-            angle_diff += 2 * np.pi
+        angle_diff = math.remainder(angle_diff, TWO_PI)
         
         max_turn_rate = 0.1  # radians per step
-        turn = np.clip(angle_diff, -max_turn_rate, max_turn_rate)
+        turn = max(-max_turn_rate, min(max_turn_rate, angle_diff))
         self.heading += turn
     
     def accelerate(self, dt: float):
@@ -158,11 +278,10 @@ class Vehicle:
     
     def update_control(self, dt: float):
         """Update vehicle control (steering and speed)"""
-        waypoint_threshold = 0.5
         max_turn_rate = 0.15
         
         # Check if reached waypoint
-        if self.reached_waypoint(waypoint_threshold):
+        if self.reached_waypoint():
             self.advance_path()
         
         # Get next waypoint
@@ -172,19 +291,16 @@ class Vehicle:
             # Steer toward waypoint
             dx = waypoint[0] - self.x
             dy = waypoint[1] - self.y
-            target_heading = np.arctan2(dy, dx)
+            target_heading = math.atan2(dy, dx)
             
             # Calculate heading difference
             angle_diff = target_heading - self.heading
             
             # Normalize to [-pi, pi]
-            while angle_diff > np.pi:
-                angle_diff -= 2 * np.pi
-            while angle_diff < -np.pi:
-                angle_diff += 2 * np.pi
+            angle_diff = math.remainder(angle_diff, TWO_PI)
             
             # Apply turn rate limit
-            turn = np.clip(angle_diff, -max_turn_rate, max_turn_rate)
+            turn = max(-max_turn_rate, min(max_turn_rate, angle_diff))
             self.heading += turn
             self.heading = normalize_angle(self.heading)
             
@@ -1,9 +1,53 @@
+import math
 import pygame
 import numpy as np
 from typing import List, Dict, Tuple, Optional
 from simulation.map import Map
 from vehicles.vehicle import Vehicle, Intent
-from v2v.message import V2VMessage
+
+
+def _link_tours(pairs: np.ndarray, n: int) -> List[List[int]]:
+    """
+    Cover every (i, j) link with as few polylines as possible
+    Each tour walks one connected group of links depth-first and goes back along
+    every link it takes, so consecutive points are always linked
+    """
+    adjacency: List[List[Tuple[int, int]]] = [[] for _ in range(n)]
+    for link, (i, j) in enumerate(pairs.tolist()):
+        adjacency[i].append((j, link))
+        adjacency[j].append((i, link))
+    
+    used = [False] * len(pairs)
+    visited = [False] * n
+    tours = []
+    for root in range(n):
+        if visited[root] or not adjacency[root]:
+            continue
+        
+        visited[root] = True
+        tour = [root]
+        stack = [(root, iter(adjacency[root]))]
+        while stack:
+            node, links = stack[-1]
+            for other, link in links:
+                if used[link]:
+                    continue
+                used[link] = True
+                tour.append(other)
+                if visited[other]:
+                    tour.append(node)
+                else:
+                    visited[other] = True
+                    stack.append((other, iter(adjacency[other])))
+                break
+            else:
+                # All links of this node are drawn, step back to where we came from
+                stack.pop()
+                if stack:
+                    tour.append(stack[-1][0])
+        tours.append(tour)
+    
+    return tours
 
 
 class Renderer:
@@ -11,9 +55,9 @@ class Renderer:
     
     def __init__(self, width: int = 1200, height: int = 800, scale: float = 1.0):
         pygame.init()
-        self.width = width
-        self.height = height
-        self.scale = scale
+        self._width = width
+        self._height = height
+        self._scale = scale
         self.screen = pygame.display.set_mode((width, height))
         pygame.display.set_caption("SafeWay - V2V Coordination Simulation")
         self.clock = pygame.time.Clock()
@@ -45,20 +89,94 @@ class Renderer:
         self.small_font = pygame.font.Font(None, 18)
         
         # Camera/viewport
-        self.offset_x = 0
-        self.offset_y = 0
-        self.zoom = 1.0
+        self._offset_x = 0
+        self._offset_y = 0
+        self._zoom = 1.0
+        self._update_view()
+    
+    @property
+    def width(self) -> int:
+        return self._width
+    
+    @width.setter
+    def width(self, value: int):
+        self._width = value
+        self._update_view()
+    
+    @property
+    def height(self) -> int:
+        return self._height
+    
+    @height.setter
+    def height(self, value: int):
+        self._height = value
+        self._update_view()
+    
+    @property
+    def scale(self) -> float:
+        return self._scale
+    
+    @scale.setter
+    def scale(self, value: float):
+        self._scale = value
+        self._update_view()
+    
+    @property
+    def offset_x(self) -> float:
+        return self._offset_x
+    
+    @offset_x.setter
+    def offset_x(self, value: float):
+        self._offset_x = value
+        self._update_view()
+    
+    @property
+    def offset_y(self) -> float:
+        return self._offset_y
+    
+    @offset_y.setter
+    def offset_y(self, value: float):
+        self._offset_y = value
+        self._update_view()
+    
+    @property
+    def zoom(self) -> float:
+        return self._zoom
+    
+    @zoom.setter
+    def zoom(self, value: float):
+        self._zoom = value
+        self._update_view()
+    
+    def _update_view(self):
+        """
+        Precompute the world-to-screen transform
+        Called whenever zoom, offset, scale or screen size changes
+        """
+        self._k = self._zoom * self._scale
+        self._cx = self._width / 2
+        self._cy = self._height / 2
+        self._offset = np.array([self._offset_x, self._offset_y], dtype=np.float64)
+        self._center = np.array([self._cx, self._cy], dtype=np.float64)
+        # Screen-space caches made under a different view are redone
+        self._last_view = (self._zoom, self._offset_x, self._offset_y,
+                           self._scale, self._width, self._height)
     
     def world_to_screen(self, x: float, y: float) -> Tuple[int, int]:
         """Convert world coordinates to screen coordinates"""
-        screen_x = int((x + self.offset_x) * self.zoom * self.scale + self.width / 2)
-        screen_y = int((y + self.offset_y) * self.zoom * self.scale + self.height / 2)
+        screen_x = int((x + self._offset_x) * self._k + self._cx)
+        screen_y = int((y + self._offset_y) * self._k + self._cy)
         return (screen_x, screen_y)
     
+    def world_to_screen_arr(self, pts: np.ndarray) -> np.ndarray:
+        """Convert an (N, 2) array of world coordinates to integer screen coordinates"""
+        return ((np.asarray(pts, dtype=np.float64) + self._offset) * self._k
+                + self._center).astype(np.int32)
+    
     def screen_to_world(self, screen_x: int, screen_y: int) -> Tuple[float, float]:
         """Convert screen coordinates to world coordinates"""
-        x = (screen_x - self.width / 2) / (self.zoom * self.scale) - self.offset_x
-        y = (screen_y - self.height / 2) / (self.zoom * self.scale) - self.offset_y
+        x = (screen_x - self._cx) / self._k - self._offset_x
+        y = (screen_y - self._cy) / self._k - self._offset_y
         return (x, y)
     
     def center_on_map(self, map_obj: Map):
@@ -114,8 +232,8 @@ class Renderer:
         
         # Draw vehicle body (rectangle oriented by heading)
         size = 8
-        cos_h = np.cos(vehicle.heading)
-        sin_h = np.sin(vehicle.heading)
+        cos_h = math.cos(vehicle.heading)
+        sin_h = math.sin(vehicle.heading)
         
         corners = [
             (pos[0] + size * cos_h - size * sin_h, pos[1] + size * sin_h + size * cos_h),
@@ -128,22 +246,17 @@ class Renderer:
         
         # Draw planned path
         if vehicle.path and show_trajectory:
-            path_points = [self.world_to_screen(p[0], p[1]) for p in vehicle.path]
+            path_points = vehicle.cached_path_points(self._last_view, self._path_to_screen)
             if len(path_points) > 1:
                 pygame.draw.lines(self.screen, (color[0]//2, color[1]//2, color[2]//2), 
                                 False, path_points, 2)
         
         # Draw planned trajectory (short-term)
-        if vehicle.planned_trajectory and show_trajectory:
-            traj_points = [self.world_to_screen(p[0], p[1]) 
-                          for p in vehicle.planned_trajectory[:8]]
+        if len(vehicle.planned_trajectory) and show_trajectory:
+            traj_points = self.world_to_screen_arr(vehicle.planned_trajectory[:8]).tolist()
             if len(traj_points) > 1:
-                # Draw trajectory with fading opacity effect
-                for i in range(len(traj_points) - 1):
-                    alpha = 255 - (i * 30)
-                    alpha = max(50, alpha)
-                    color = (255, 255, 0)  # yellow
-                    pygame.draw.line(self.screen, color, traj_points[i], traj_points[i+1], 1)
+                # Every segment shares one color, so draw the polyline in one call
+                pygame.draw.lines(self.screen, (255, 255, 0), False, traj_points, 1)  # yellow
         
         # Draw intent indicator
         if show_intent:
@@ -172,20 +285,24 @@ class Renderer:
         pygame.draw.rect(self.screen, (0, 0, 0, 180), text_rect.inflate(4, 2))
         self.screen.blit(id_text, text_rect)
     
-    def draw_v2v_connections(self, vehicle: Vehicle, nearby_vehicles: List[V2VMessage],
-                            comm_radius: float):
-        """Draw V2V communication links"""
-        vehicle_pos = self.world_to_screen(vehicle.x, vehicle.y)
+    def _path_to_screen(self, path: List[Tuple[float, float]]) -> List[List[int]]:
+        """Convert a path to screen points for pygame"""
+        return self.world_to_screen_arr(path).tolist()
+    
+    def draw_v2v_links(self, positions: np.ndarray, pairs: np.ndarray):
+        """
+        Draw V2V communication links between all vehicles in range of each other
+        positions is the (N, 2) array of vehicle positions from World.snapshot and
+        pairs the (M, 2) in-range row pairs from World.neighbor_pairs
+        """
+        if not len(pairs):
+            return
         
-        for msg in nearby_vehicles:
-            other_pos = self.world_to_screen(msg.position[0], msg.position[1])
-            dist = np.sqrt((vehicle.x - msg.position[0])**2 + 
-                          (vehicle.y - msg.position[1])**2)
-            
-            if dist <= comm_radius:
-                # Draw communication link (dashed line)
-                pygame.draw.line(self.screen, (200, 200, 255), 
-                               vehicle_pos, other_pos, 1)
+        # One polyline per connected group of vehicles instead of one line per link
+        screen_pos = self.world_to_screen_arr(positions).tolist()
+        for tour in _link_tours(pairs, len(positions)):
+            pygame.draw.aalines(self.screen, (200, 200, 255), False,
+                                [screen_pos[row] for row in tour])
     
     def draw_ui(self, time: float, step: int, mode: str, num_vehicles: int, 
                 collisions: int = 0, messages: int = 0):
@@ -246,15 +363,19 @@ class Renderer:
         """Update display"""
         pygame.display.flip()
     
-    def handle_events(self) -> bool:
-        """Handle pygame events, return False if should quit"""
-        for event in pygame.event.get():
+    def handle_events(self) -> Tuple[bool, List[pygame.event.Event]]:
+        """
+        Handle pygame events
+        Returns (running, events) where running is False if should quit
+        """
+        events = pygame.event.get()
+        for event in events:
             if event.type == pygame.QUIT:
-                return False
+                return False, events
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
-                    return False
-        return True
+                    return False, events
+        return True, events
     
     def tick(self, fps: int = 60):
         """Tick the clock"""